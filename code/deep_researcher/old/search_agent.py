@@ -1,7 +1,10 @@
 from typing import List, Optional
+from itertools import islice
 from pydantic import BaseModel, Field, field_validator
 from agents import FunctionTool, Agent
 import arxiv
+import asyncio
+import io
 import json
 from dotenv import load_dotenv
 
@@ -20,6 +23,11 @@ INSTRUCTIONS = (
     "someone synthesizing a report, so it's vital you capture the essence and ignore any peripheral details."
 )
 
+VALID_CATEGORIES = frozenset({
+    'cs.AI', 'quant-ph', 'cs.LG', 'cs.CL', 'cs.NE',
+    'stat.ML', 'cs.CV', 'cs.RO', 'cs.HC'
+})
+
 class ArxivSearchArgs(BaseModel):
     query: str = Field(description="The search query to find relevant papers")
     max_results: int = Field(default=5, description="Maximum number of results to return", gt=0, le=100)
@@ -27,23 +35,32 @@ class ArxivSearchArgs(BaseModel):
 
     @field_validator('query')
     def query_not_empty(cls, v):
-        if not v.strip():
+        v = v.strip()
+        if not v:
             raise ValueError('Query cannot be empty')
-        return v.strip()
+        return v
 
     @field_validator('categories')
     def validate_categories(cls, v):
         if v is None:
             return v
-        valid_categories = {
-            'cs.AI', 'quant-ph', 'cs.LG', 'cs.CL', 'cs.NE',
-            'stat.ML', 'cs.CV', 'cs.RO', 'cs.HC'
-        }
-        for category in v:
-            if category not in valid_categories:
-                raise ValueError(f'Invalid category: {category}. Valid categories are: {valid_categories}')
+        invalid = set(v) - VALID_CATEGORIES
+        if invalid:
+            raise ValueError(f'Invalid categories: {sorted(invalid)}. Valid categories are: {sorted(VALID_CATEGORIES)}')
         return v
 
+def _format_results(client: arxiv.Client, search: arxiv.Search) -> str:
+    """Fetch the search results (blocking) and format them as one text block."""
+    buf = io.StringIO()
+    for result in islice(client.results(search), search.max_results):
+        arxiv_id = result.entry_id.rsplit('/', 1)[-1]
+        authors = ', '.join(author.name for author in result.authors)
+        buf.write(
+            f"Title: {result.title}\nAuthors: {authors}\nSummary: {result.summary}\n"
+            f"ArXiv ID: {arxiv_id}\nURL: {result.pdf_url}\n\n"
+        )
+    return buf.getvalue().rstrip()
+
 async def arxiv_search(_, args_json: str) -> str:
     """Search arXiv for papers matching the query and return formatted results."""
     args = ArxivSearchArgs.model_validate_json(args_json)
@@ -55,7 +72,7 @@ async def arxiv_search(_, args_json: str) -> str:
         search_query = f'({search_query}) AND ({category_query})'
     
     # Create arxiv client
-    client = arxiv.Client()
+    client = arxiv.Client(page_size=min(args.max_results, 100))
     
     # Perform the search
     search = arxiv.Search(
@@ -64,19 +81,10 @@ async def arxiv_search(_, args_json: str) -> str:
         sort_by=arxiv.SortCriterion.SubmittedDate
     )
     
-    # Format results
-    results = []
-    for result in client.results(search):
-        paper_info = {
-            'Title': result.title,
-            'Authors': ', '.join(author.name for author in result.authors),
-            'Summary': result.summary,
-            'ArXiv ID': result.entry_id.split('/')[-1],
-            'URL': result.pdf_url
-        }
-        results.append('\n'.join(f'{k}: {v}' for k, v in paper_info.items()))
+    # Run the blocking arxiv client in a worker thread so the event loop stays free
+    results = await asyncio.to_thread(_format_results, client, search)
     
-    return '\n\n'.join(results) if results else "No papers found matching the criteria."
+    return results or "No papers found matching the criteria."
 
 # Create the function tool
 arxiv_search_tool = FunctionTool(
@@ -1,6 +1,8 @@
 import asyncio
 import json
+import orjson
 from datetime import datetime
+from operator import itemgetter
 from search_execution_agent import search_execution
 from abstract_screening_agent import screen_abstracts, MethodologyType, RelevanceScore
 
@@ -16,8 +18,8 @@ async def test_screening():
     
     try:
         print("Step 1: Executing search...")
-        search_results = await search_execution(None, json.dumps(search_query))
-        search_data = json.loads(search_results)
+        search_results = await search_execution(None, orjson.dumps(search_query).decode())
+        search_data = orjson.loads(search_results)
         
         # Extract papers from search results
         papers = []
@@ -46,8 +48,8 @@ async def test_screening():
         }
         
         print("\nStep 2: Screening papers...")
-        screening_results = await screen_abstracts(None, json.dumps(screening_query))
-        screening_data = json.loads(screening_results)
+        screening_results = await screen_abstracts(None, orjson.dumps(screening_query).decode())
+        screening_data = orjson.loads(screening_results)
         
         print("\nScreening Results:")
         for batch in screening_data:
@@ -59,7 +61,7 @@ async def test_screening():
                 print(f"- {theme['theme_name']} (frequency: {theme['frequency']})")
             
             print("\nPapers by Priority:")
-            for paper in sorted(batch['papers'], key=lambda x: x['priority_rank']):
+            for paper in sorted(batch['papers'], key=itemgetter('priority_rank')):
                 print(f"\nRank {paper['priority_rank']}:")
                 print(f"Title: {paper['title']}")
                 print(f"Relevance: {paper['relevance_score']}")
@@ -1,5 +1,5 @@
 import asyncio
-import json
+import orjson
 from search_execution_agent import search_execution
 
 async def test_search():
@@ -14,19 +14,22 @@ async def test_search():
     
     try:
         print("Starting search execution...")
-        result = await search_execution(None, json.dumps(query))
+        result = await search_execution(None, orjson.dumps(query).decode())
         
-        # Parse and pretty print the results
-        papers = json.loads(result)
-        print("\nSearch Results:")
+        # Parse and pretty print the results, writing the report in one go
+        papers = orjson.loads(result)
+        lines = ["\nSearch Results:"]
         for batch in papers:
-            print(f"\nBatch {batch['batch_number']}:")
+            lines.append(f"\nBatch {batch['batch_number']}:")
             for paper in batch['papers']:
-                print(f"\nTitle: {paper['title']}")
-                print(f"Authors: {', '.join(paper['authors'])}")
-                print(f"ArXiv ID: {paper['arxiv_id']}")
-                print(f"Categories: {', '.join(paper['categories'])}")
-                print("-" * 80)
+                lines.extend((
+                    f"\nTitle: {paper['title']}",
+                    f"Authors: {', '.join(paper['authors'])}",
+                    f"ArXiv ID: {paper['arxiv_id']}",
+                    f"Categories: {', '.join(paper['categories'])}",
+                    "-" * 80
+                ))
+        print("\n".join(lines))
         
         print("\nSearch completed successfully!")
         
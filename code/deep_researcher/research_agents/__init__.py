@@ -1,2 +1,5 @@
 """Research agents package."""
+from dotenv import load_dotenv
 
+# Load .env once for the whole package rather than in every agent module
+load_dotenv()
@@ -1,23 +1,23 @@
 from typing import List, Dict, Optional, Any
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, ValidationError, field_validator
 from datetime import datetime
 import json
+import orjson
 import logging
 from enum import Enum
 from dataclasses import dataclass
 from agents import FunctionTool, Agent
 import asyncio
-from openai import OpenAI
-from dotenv import load_dotenv
+from openai import AsyncOpenAI
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
+from .client import create_chat_completion, create_async_client
 from .types import ScreenedPaper
 
+# Model used for every screening request, interactive or batched
+SCREENING_MODEL = "gpt-4o-mini"
+
 INSTRUCTIONS = """
 You are an Abstract Screening specialist focused on evaluating research papers.
 Your role is to:
@@ -31,6 +31,36 @@ Ensure thorough evaluation and clear documentation of decisions.
 Focus on both individual paper assessment and pattern recognition across the corpus.
 """
 
+# Screening prompts shared by the interactive and batch paths
+SYSTEM_MESSAGE = """You are an expert at screening research papers for systematic reviews. Your role is to:
+    1. Analyze paper abstracts against inclusion criteria
+    2. Assess relevance to the research question
+    3. Evaluate methodological quality
+    4. Assign priority rankings
+    5. Provide clear rationale for decisions
+    
+    You must output your response in the following JSON format:
+    {
+        "relevance_score": float between 0 and 1,
+        "inclusion_criteria": {
+            "criterion1": boolean,
+            "criterion2": boolean,
+            "criterion3": boolean,
+        },
+        "priority_rank": integer (1 being highest),
+        "rationale": "explanation string"
+    }"""
+
+USER_MESSAGE_TEMPLATE = """Please screen this paper against the given criteria.
+    Provide a detailed assessment of the paper's relevance and quality.
+    
+    Research Context: {context}
+    Screening Criteria: {criteria}
+    
+    Title: {title}
+    Authors: {authors}
+    Abstract: {abstract}"""
+
 class RelevanceScore(Enum):
     """Relevance scoring levels"""
     HIGH = 3
@@ -105,84 +135,74 @@ class ScreeningBatch(BaseModel):
 class AbstractScreeningAgent:
     """Agent for screening paper abstracts based on research criteria."""
     
-    def __init__(self, client: OpenAI = None, timeout: int = 120):
-        self.client = client or OpenAI()
+    def __init__(self, client: AsyncOpenAI = None, timeout: int = 120, max_concurrent_requests: int = 8):
+        self.client = client or create_async_client()
         self.timeout = timeout
+        self.max_concurrent_requests = max_concurrent_requests
+        # Created on first use so it binds to the running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        
+    def _build_messages(self, paper: Dict[str, Any], criteria: Dict[str, Any], context: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Build the chat messages for screening one paper."""
+        # Create the user message; the context and criteria shared by every paper come before
+        # the paper itself so consecutive screening calls share a cacheable prompt prefix
+        user_message = USER_MESSAGE_TEMPLATE.format(
+            context=json.dumps(context or {}, sort_keys=True),
+            criteria=json.dumps(criteria, sort_keys=True),
+            title=paper.get('title', 'N/A'),
+            authors=', '.join(paper.get('authors', ['N/A'])),
+            abstract=paper.get('abstract', 'N/A')
+        )
+        
+        return [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": user_message}
+        ]
+        
+    def _parse_screening(self, paper: Dict[str, Any], content: str) -> ScreenedPaper:
+        """Convert the model's JSON reply for a paper into a ScreenedPaper."""
+        try:
+            screening_result = ScreeningResult.model_validate_json(content)
+        except (ValidationError, KeyError) as e:
+            raise ValueError(f"Invalid response format: {str(e)}")
+            
+        # Convert to ScreenedPaper format
+        return ScreenedPaper(
+            paper_id=paper.get('paper_id', ''),
+            title=paper.get('title', ''),
+            authors=paper.get('authors', []),
+            abstract=paper.get('abstract', ''),
+            relevance_score=screening_result.relevance_score,
+            inclusion_criteria=screening_result.inclusion_criteria,
+            priority_rank=screening_result.priority_rank,
+            metadata={
+                "rationale": screening_result.rationale,
+                **paper.get('metadata', {})
+            }
+        )
         
     async def screen_paper(self, paper: Dict[str, Any], criteria: Dict[str, Any], context: Dict[str, Any] = None) -> ScreenedPaper:
         """Screen a single paper based on its abstract and metadata."""
         try:
-            # Create the system message with instructions
-            system_message = """You are an expert at screening research papers for systematic reviews. Your role is to:
-            1. Analyze paper abstracts against inclusion criteria
-            2. Assess relevance to the research question
-            3. Evaluate methodological quality
-            4. Assign priority rankings
-            5. Provide clear rationale for decisions
-            
-            You must output your response in the following JSON format:
-            {
-                "relevance_score": float between 0 and 1,
-                "inclusion_criteria": {
-                    "criterion1": boolean,
-                    "criterion2": boolean,
-                    "criterion3": boolean,
-                },
-                "priority_rank": integer (1 being highest),
-                "rationale": "explanation string"
-            }"""
-            
-            # Create the user message with the paper and criteria
-            user_message = f"""Please screen this paper against the given criteria:
-            
-            Title: {paper.get('title', 'N/A')}
-            Authors: {', '.join(paper.get('authors', ['N/A']))}
-            Abstract: {paper.get('abstract', 'N/A')}
-            
-            Research Context: {json.dumps(context) if context else '{}'}
-            Screening Criteria: {json.dumps(criteria)}
-            
-            Provide a detailed assessment of the paper's relevance and quality."""
-            
-            # Call the OpenAI API with a timeout
+            # Call the OpenAI API with a timeout, capping concurrent requests across all screening calls
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
             try:
-                response = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        self.client.chat.completions.create,
-                        model="gpt-4o-mini",
-                        response_format={"type": "json_object"},
-                        messages=[
-                            {"role": "system", "content": system_message},
-                            {"role": "user", "content": user_message}
-                        ]
-                    ),
-                    timeout=self.timeout
-                )
+                async with self._semaphore:
+                    response = await asyncio.wait_for(
+                        create_chat_completion(
+                            self.client,
+                            model=SCREENING_MODEL,
+                            response_format={"type": "json_object"},
+                            messages=self._build_messages(paper, criteria, context)
+                        ),
+                        timeout=self.timeout
+                    )
             except asyncio.TimeoutError:
                 raise TimeoutError("Assistant took too long to respond")
             
             # Parse the response
-            try:
-                response_data = json.loads(response.choices[0].message.content)
-                screening_result = ScreeningResult(**response_data)
-                
-                # Convert to ScreenedPaper format
-                return ScreenedPaper(
-                    paper_id=paper.get('paper_id', ''),
-                    title=paper.get('title', ''),
-                    authors=paper.get('authors', []),
-                    abstract=paper.get('abstract', ''),
-                    relevance_score=screening_result.relevance_score,
-                    inclusion_criteria=screening_result.inclusion_criteria,
-                    priority_rank=screening_result.priority_rank,
-                    metadata={
-                        "rationale": screening_result.rationale,
-                        **paper.get('metadata', {})
-                    }
-                )
-                
-            except (json.JSONDecodeError, KeyError) as e:
-                raise ValueError(f"Invalid response format: {str(e)}")
+            return self._parse_screening(paper, response.choices[0].message.content)
             
         except TimeoutError:
             raise  # Re-raise TimeoutError without wrapping
@@ -196,6 +216,81 @@ class AbstractScreeningAgent:
             for paper in papers
         ]
         return await asyncio.gather(*tasks)
+        
+    async def screen_papers_batch(
+        self,
+        papers: List[Dict[str, Any]],
+        criteria: Dict[str, Any],
+        context: Dict[str, Any] = None,
+        poll_interval: float = 30.0
+    ) -> List[ScreenedPaper]:
+        """Screen papers through the OpenAI Batch API.
+        
+        Batch requests cost half as much but may take up to 24 hours, so this
+        suits large offline reviews rather than interactive runs. Papers the
+        batch did not answer are screened individually with screen_paper.
+        """
+        if not papers:
+            return []
+            
+        # One JSONL request line per paper; the list index is the custom_id
+        requests = b"\n".join(
+            orjson.dumps({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": SCREENING_MODEL,
+                    "response_format": {"type": "json_object"},
+                    "messages": self._build_messages(paper, criteria, context)
+                }
+            })
+            for index, paper in enumerate(papers)
+        )
+        
+        try:
+            input_file = await self.client.files.create(file=("screening.jsonl", requests), purpose="batch")
+            batch = await self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            logger.info(f"Submitted screening batch {batch.id} with {len(papers)} papers")
+            
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                await asyncio.sleep(poll_interval)
+                batch = await self.client.batches.retrieve(batch.id)
+                
+            if batch.status != "completed":
+                raise RuntimeError(f"Screening batch {batch.id} ended with status {batch.status}")
+                
+            replies: Dict[int, str] = {}
+            if batch.output_file_id:
+                output = await self.client.files.content(batch.output_file_id)
+                for line in output.content.splitlines():
+                    record = orjson.loads(line)
+                    response = record.get("response") or {}
+                    if response.get("status_code") == 200:
+                        replies[int(record["custom_id"])] = response["body"]["choices"][0]["message"]["content"]
+        except RuntimeError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to run screening batch: {str(e)}") from e
+            
+        screened: List[Optional[ScreenedPaper]] = [None] * len(papers)
+        retry = []
+        for index, paper in enumerate(papers):
+            try:
+                screened[index] = self._parse_screening(paper, replies[index])
+            except (KeyError, ValueError):
+                retry.append(index)
+                
+        if retry:
+            logger.warning(f"Batch missed {len(retry)} papers; screening them individually")
+            for index, result in zip(retry, await self.screen_papers([papers[i] for i in retry], criteria, context)):
+                screened[index] = result
+                
+        return screened
 
 # Create the abstract screening agent
 abstract_screening_agent = Agent(
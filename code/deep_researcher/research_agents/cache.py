@@ -0,0 +1,109 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+def cache_key(*parts: Any) -> str:
+    """Build a stable SHA1 cache key from JSON-serializable parts."""
+    payload = json.dumps(list(parts), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def cache_bypassed() -> bool:
+    """Whether the CACHE_BYPASS environment variable asks every cache lookup to miss."""
+    return os.environ.get("CACHE_BYPASS", "") not in ("", "0")
+
+def normalize_text(text: str) -> str:
+    """Casefold and collapse whitespace so trivially different inputs share a cache key."""
+    return " ".join(text.casefold().split())
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace only; arXiv treats uppercase AND/OR/ANDNOT as operators, so case matters."""
+    return " ".join(query.split())
+
+class SQLiteCache:
+    """Persistent key/value cache stored in a single SQLite table.
+
+    Several caches can share one database file by using different tables.
+    Access is serialized with a lock so the cache can be used from asyncio
+    tasks and worker threads alike. Setting the CACHE_BYPASS environment
+    variable turns every lookup into a miss while still refreshing entries.
+    """
+
+    def __init__(self, path: str, table: str = "cache", ttl_seconds: Optional[int] = None):
+        """Open (or create) the cache table in the given SQLite file.
+
+        Args:
+            path: Path of the SQLite database file
+            table: Table holding this cache's entries
+            ttl_seconds: Entries older than this are treated as misses (None = never expire)
+        """
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.bypass = cache_bypassed()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value BLOB, ts INTEGER)"
+            )
+
+    def get(self, key: str) -> Optional[Union[str, bytes]]:
+        """Return the cached value for key, or None on a miss or expired entry."""
+        if self.bypass:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, ts FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, ts = row
+        if self.ttl_seconds is not None and time.time() - ts > self.ttl_seconds:
+            return None
+        return value
+
+    def set(self, key: str, value: Union[str, bytes]) -> None:
+        """Store value under key, replacing any previous entry."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, ts) VALUES (?, ?, ?)",
+                (key, value, int(time.time()))
+            )
+
+    def get_many(self, keys: List[str]) -> Dict[str, Union[str, bytes]]:
+        """Return the live entries among keys; missing and expired keys are omitted."""
+        if not keys or self.bypass:
+            return {}
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(
+                    (key, (value, ts)) for key, value, ts in self._conn.execute(
+                        f"SELECT key, value, ts FROM {self.table} WHERE key IN ({placeholders})", chunk
+                    )
+                )
+        now = time.time()
+        return {
+            key: value for key, (value, ts) in found.items()
+            if self.ttl_seconds is None or now - ts <= self.ttl_seconds
+        }
+
+    def set_many(self, items: Iterable[Tuple[str, Union[str, bytes]]]) -> None:
+        """Store several entries in a single transaction."""
+        ts = int(time.time())
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, ts) VALUES (?, ?, ?)",
+                ((key, value, ts) for key, value in items)
+            )
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
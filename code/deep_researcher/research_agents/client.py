@@ -0,0 +1,47 @@
+import logging
+import httpx
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+logger = logging.getLogger(__name__)
+
+def create_async_client() -> AsyncOpenAI:
+    """Create an AsyncOpenAI client on a pooled HTTP/2 connection set.
+
+    Agents sharing the client amortize TLS handshakes and multiplex concurrent
+    calls instead of each holding its own connections. The connections bind to
+    the event loop that first uses them, so create one client per event loop
+    and close it with `await client.close()` when done. The SDK's own retries
+    are disabled so create_chat_completion is the only retry layer.
+    """
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+        timeout=120
+    )
+    return AsyncOpenAI(http_client=http_client, max_retries=0)
+
+@retry(
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, InternalServerError)),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(5),
+    reraise=True
+)
+async def create_chat_completion(client: AsyncOpenAI, **kwargs):
+    """Create a chat completion, retrying rate-limited and transient failures with jittered exponential backoff.
+    
+    Use a client built with max_retries=0 (such as create_async_client()) so SDK
+    retries do not stack on top of these.
+    
+    Logs how much of the prompt was served from OpenAI's prompt cache at debug level.
+    """
+    response = await client.chat.completions.create(**kwargs)
+    usage = getattr(response, "usage", None)
+    if usage is not None and logger.isEnabledFor(logging.DEBUG):
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        logger.debug(
+            "%s prompt cache: %d/%d tokens cached (%.0f%%)",
+            kwargs.get("model"), cached, usage.prompt_tokens, 100 * cached / max(usage.prompt_tokens, 1)
+        )
+    return response
@@ -1,21 +1,71 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Optional
+from collections import OrderedDict
 import asyncio
+import hashlib
 import json
-from openai import OpenAI
-from pydantic import BaseModel, Field
-from dotenv import load_dotenv
-
-load_dotenv()
+import logging
+import orjson
+from openai import AsyncOpenAI
 
+from .cache import SQLiteCache, cache_bypassed, normalize_text
+from .client import create_chat_completion, create_async_client
 from .types import SearchStrategy
 
-class KeywordSet(BaseModel):
-    """Structure for keyword analysis results."""
-    primary_terms: List[str] = Field(description="Core concept terms")
-    secondary_terms: List[str] = Field(description="Related concept terms")
-    synonyms: Dict[str, List[str]] = Field(description="Synonyms for primary terms")
-    #boolean_combinations: List[str] = Field(description="Boolean search combinations")
-    constraints: Dict[str, Any] = Field(description="Search constraints")
+logger = logging.getLogger(__name__)
+
+# Prompts are fixed at import time; only the inputs filled into the template vary, and they
+# come last so repeated requests share a cacheable prompt prefix
+SYSTEM_MESSAGE = """You are an expert at keyword analysis and search strategy formulation. Your role is to:
+    1. Analyze research questions to identify key concepts
+    2. Generate comprehensive keyword sets including:
+       - Core concepts 
+       - Related concepts 
+       - Technical terms (architecture, methodology)
+       - Variations and synonyms
+       - terms should also look like this:
+         - (term1 AND term2) AND (term3 OR term4)
+         - (term1 OR term2) AND (term3 OR term4)
+         - (term1 OR term2 OR term3) AND (term4 OR term5)
+
+    3. Focus on both specific and broad terms
+    4. Consider recent developments and trends
+    
+    You must output your response in the following JSON format:
+    {
+        "keywords": [
+            "term1",
+            "term2",
+            ...
+        ],
+        "constraints": {
+            "field": "value",
+            "categories": ["category1", "category2"],
+            ...
+        }
+    }"""
+
+USER_MESSAGE_TEMPLATE = """Please analyze this research question and generate a comprehensive search strategy.
+    Generate a comprehensive search strategy for the research question.
+    
+    Context: {context}
+    Research Question: {research_question}"""
+
+# Memoized strategies keyed by research question + context, bounded LRU
+_STRATEGY_CACHE: "OrderedDict[str, SearchStrategy]" = OrderedDict()
+_STRATEGY_CACHE_SIZE = 1024
+
+def _strategy_cache_key(research_question: str, context: Optional[Dict[str, Any]]) -> str:
+    """Build a stable cache key for a research question and its context."""
+    payload = normalize_text(research_question) + json.dumps(context or {}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def _remember_strategy(key: str, strategy: SearchStrategy) -> None:
+    """Store a private copy of a strategy in the in-memory LRU, evicting the oldest entry when full."""
+    # Callers mutate the returned strategy, so cache a copy
+    _STRATEGY_CACHE[key] = strategy.model_copy(deep=True)
+    _STRATEGY_CACHE.move_to_end(key)
+    if len(_STRATEGY_CACHE) > _STRATEGY_CACHE_SIZE:
+        _STRATEGY_CACHE.popitem(last=False)
 
 # def generate_search_combinations(keywords: List[str], context: Dict[str, Any]) -> List[str]:
 #     """Generate boolean search combinations from keywords."""
@@ -44,59 +94,43 @@ class KeywordSet(BaseModel):
 class KeywordAnalysisAgent:
     """Agent for analyzing research questions and generating comprehensive search strategies."""
     
-    def __init__(self, client: OpenAI = None, timeout: int = 120):
-        self.client = client or OpenAI()
+    def __init__(self, client: AsyncOpenAI = None, timeout: int = 120, cache_path: Optional[str] = None):
+        self.client = client or create_async_client()
         self.timeout = timeout
+        # Optional on-disk cache so strategies survive across runs
+        self._cache = SQLiteCache(cache_path, table="keyword_strategies") if cache_path else None
         
     async def analyze(self, research_question: str, context: Dict[str, Any] = None) -> SearchStrategy:
         """Generate a comprehensive search strategy from research questions."""
-        try:
-            # Create the system message with instructions
-            system_message = """You are an expert at keyword analysis and search strategy formulation. Your role is to:
-            1. Analyze research questions to identify key concepts
-            2. Generate comprehensive keyword sets including:
-               - Core concepts 
-               - Related concepts 
-               - Technical terms (architecture, methodology)
-               - Variations and synonyms
-               - terms should also look like this:
-                 - (term1 AND term2) AND (term3 OR term4)
-                 - (term1 OR term2) AND (term3 OR term4)
-                 - (term1 OR term2 OR term3) AND (term4 OR term5)
-
-            3. Focus on both specific and broad terms
-            4. Consider recent developments and trends
-            
-            You must output your response in the following JSON format:
-            {
-                "keywords": [
-                    "term1",
-                    "term2",
-                    ...
-                ],
-                "constraints": {
-                    "field": "value",
-                    "categories": ["category1", "category2"],
-                    ...
-                }
-            }"""
+        cache_key = _strategy_cache_key(research_question, context)
+        # CACHE_BYPASS skips the in-memory LRU as well; the SQLite cache checks it itself
+        cached = None if cache_bypassed() else _STRATEGY_CACHE.get(cache_key)
+        if cached is not None:
+            _STRATEGY_CACHE.move_to_end(cache_key)
+            return cached.model_copy(deep=True)
+        if self._cache is not None:
+            stored = self._cache.get(cache_key)
+            if stored is not None:
+                strategy = SearchStrategy.model_validate_json(stored)
+                _remember_strategy(cache_key, strategy)
+                return strategy
             
+        try:
             # Create the user message with the research question and context
-            user_message = f"""Please analyze this research question and generate a comprehensive search strategy:
-            Research Question: {research_question}
-            Context: {json.dumps(context) if context else '{}'}
-            
-           Generate a comprehensive search strategy for the research question."""
+            user_message = USER_MESSAGE_TEMPLATE.format(
+                context=json.dumps(context or {}, sort_keys=True),
+                research_question=research_question
+            )
             
             # Call the OpenAI API with a timeout
             try:
                 response = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        self.client.chat.completions.create,
+                    create_chat_completion(
+                        self.client,
                         model="gpt-4o-mini",
                         response_format={"type": "json_object"},
                         messages=[
-                            {"role": "system", "content": system_message},
+                            {"role": "system", "content": SYSTEM_MESSAGE},
                             {"role": "user", "content": user_message}
                         ]
                     ),
@@ -107,20 +141,25 @@ class KeywordAnalysisAgent:
             
             # Parse the response
             try:
-                response_data = json.loads(response.choices[0].message.content)
+                response_data = orjson.loads(response.choices[0].message.content)
                 keywords = response_data.get("keywords", [])
                 
                 # Generate search combinations
                 #combinations = generate_search_combinations(keywords, context or {})
-                print(f"Keywords: {keywords}")
+                logger.debug("Keywords: %s", keywords)
 
                 # Create the output
-                return SearchStrategy(
+                strategy = SearchStrategy(
                     keywords=keywords,
                     #combinations=combinations,
                     constraints=context or {}
                 )
                 
+                _remember_strategy(cache_key, strategy)
+                if self._cache is not None:
+                    self._cache.set(cache_key, strategy.model_dump_json())
+                return strategy
+                
             except (json.JSONDecodeError, KeyError) as e:
                 raise ValueError(f"Invalid response format: {str(e)}")
             
@@ -128,6 +167,11 @@ class KeywordAnalysisAgent:
             raise  # Re-raise TimeoutError without wrapping
         except Exception as e:
             raise RuntimeError(f"Failed to analyze keywords: {str(e)}") from e
+            
+    def close(self) -> None:
+        """Close the on-disk cache, if one was opened."""
+        if self._cache is not None:
+            self._cache.close()
 
 # async def analyze_keywords(_, args_json: str) -> str:
 #     """Analyze research question to generate search keywords."""
@@ -1,25 +1,55 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import logging
+import time
+from collections import Counter
+from operator import attrgetter
 from datetime import datetime
-import json
-from pydantic import BaseModel, Field
+import orjson
+from pydantic import BaseModel, ConfigDict, Field
 from tenacity import retry, stop_after_attempt, wait_exponential
 
-from .search_execution_agent import search_execution_tool
+from .cache import SQLiteCache, cache_key, normalize_query
+from .search_execution_agent import BATCH_SIZE_LIMIT, MAX_RESULTS_LIMIT, execute_search
 from .types import SearchStrategy
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _dedupe_keywords(keywords: List[str]) -> Tuple[List[str], List[int]]:
+    """Collapse keywords that differ only in spacing.
+    
+    Word order and case are kept: keywords may be boolean queries such as
+    "(a OR b) AND c", where both change the search. Keywords that are the
+    same query need only one representative searched.
+    
+    Returns:
+        The representative keywords and, for each input keyword, the index
+        of its representative
+    """
+    representatives: List[str] = []
+    index_map: List[int] = []
+    seen: Dict[str, int] = {}
+    for keyword in keywords:
+        signature = normalize_query(keyword)
+        if signature not in seen:
+            seen[signature] = len(representatives)
+            representatives.append(keyword)
+        index_map.append(seen[signature])
+    return representatives, index_map
+
 class RefinementConfig(BaseModel):
     """Configuration for keyword refinement process."""
     keywords: List[str] = Field(..., description="Keywords to analyze (can be multi-word)")
     papers_per_keyword: int = Field(default=100, description="Number of papers to retrieve per keyword")
     year_range: Optional[int] = Field(default=3, description="Year range for time constraints")
+    max_concurrent_searches: int = Field(default=8, description="Maximum number of keyword searches in flight; arXiv requests are still made one at a time", gt=0)
+    keywords_per_query: int = Field(default=1, description="Keywords merged into one OR query per arXiv call; each is scored against the shared results", gt=0)
+    cache_path: Optional[str] = Field(default=None, description="SQLite file used to cache keyword results across runs")
 
 class KeywordScore(BaseModel):
     """Results for a single keyword."""
+    model_config = ConfigDict(frozen=True)
+    
     keyword: str = Field(..., description="The keyword being analyzed")
     papers: List[Dict[str, Any]] = Field(default_factory=list, description="Found papers")
     word_count: int = Field(..., description="Number of words in keyword")
@@ -39,8 +69,18 @@ class KeywordRefinement:
         """Initialize the refinement process with configuration."""
         self.config = config
         self.results = RefinementResult()
+        # Keyword entries hold only paper IDs; each paper is stored once in its own table
+        self._cache = SQLiteCache(config.cache_path, table="keyword_index") if config.cache_path else None
+        self._paper_cache = SQLiteCache(config.cache_path, table="papers") if config.cache_path else None
+        # Papers seen during this refinement, keyed by arXiv ID and shared across keywords
+        self._paper_pool: Dict[str, Dict[str, Any]] = {}
+        # Lowercased abstracts of pooled papers, kept apart so they are not serialized
+        self._abstracts_lc: Dict[str, str] = {}
+        # Keyword searches of this refinement, keyed by normalized keyword group
+        self._inflight: Dict[Tuple[str, ...], asyncio.Task] = {}
         
-    def _calculate_score(self, total_hits: int, papers_with_hits: int, word_count: int, total_papers: int) -> float:
+    @staticmethod
+    def _calculate_score(total_hits: int, papers_with_hits: int, word_count: int, total_papers: int) -> float:
         """Calculate keyword score based on hits and word count.
         
         Args:
@@ -59,75 +99,169 @@ class KeywordRefinement:
         coverage = papers_with_hits / total_papers
         
         # Calculate average hits per paper with hits
-        intensity = total_hits / total_papers if total_papers > 0 else 0
+        intensity = total_hits / total_papers
         
         # Weight by word count (more words = higher potential relevance)
         word_weight = word_count * 0.5  # Adjust multiplier to control word count importance
         
         return (coverage + intensity) * (1 + word_weight)
         
-    async def _analyze_keyword(self, keyword: str) -> KeywordScore:
-        """Analyze a single keyword by searching papers and calculating hits."""
+    async def _analyze_keyword_group(self, keywords: List[str]) -> List[KeywordScore]:
+        """Search papers for a group of keywords with one query and score each keyword locally.
+        
+        A group of more than one keyword is searched as a single OR query, and
+        every keyword in it is scored against the shared result set. Identical
+        groups (after normalization) share one search for the lifetime of this
+        refinement, including searches that are still in flight.
+        """
+        memo_key = tuple(normalize_query(keyword) for keyword in keywords)
+        task = self._inflight.get(memo_key)
+        if task is None:
+            task = asyncio.ensure_future(self._search_keyword_group(keywords))
+            self._inflight[memo_key] = task
+            
+        try:
+            results = await asyncio.shield(task)
+        except Exception as e:
+            # Failures are not memoized, so a later call retries the search
+            if self._inflight.get(memo_key) is task:
+                del self._inflight[memo_key]
+            logger.error(f"Analysis failed for keywords: {', '.join(keywords)}. Error: {str(e)}")
+            return [self._empty_score(keyword) for keyword in keywords]
+            
+        return [
+            result if result.keyword == keyword else result.model_copy(update={"keyword": keyword})
+            for keyword, result in zip(keywords, results)
+        ]
+        
+    async def _search_keyword_group(self, keywords: List[str]) -> List[KeywordScore]:
+        """Run the cached or live search for a keyword group; raises on search failure."""
+        # execute_search skips argument validation, so blank keywords never reach the query
+        searchable = [keyword for keyword in keywords if keyword.strip()]
+        if len(searchable) < len(keywords):
+            scores = dict(zip(searchable, await self._search_keyword_group(searchable))) if searchable else {}
+            return [scores[keyword] if keyword in scores else self._empty_score(keyword) for keyword in keywords]
+            
+        current_year = datetime.now().year
+        key_parts = (self.config.papers_per_keyword, self.config.year_range, current_year)
+        normalized = [normalize_query(keyword) for keyword in keywords]
+        if len(keywords) == 1:
+            keys = [cache_key(normalized[0], *key_parts)]
+        else:
+            # Scores depend on the shared result set, so the group is part of the key
+            keys = [cache_key(keyword, *key_parts, normalized) for keyword in normalized]
+        if self._cache:
+            cached = [self._load_cached(key) for key in keys]
+            if all(result is not None for result in cached):
+                logger.info(f"Using cached analysis for keywords: {', '.join(keywords)}")
+                return cached
+                
         # Prepare search query with year constraint if specified
-        query = keyword
+        query = keywords[0] if len(keywords) == 1 else " OR ".join(f"({keyword})" for keyword in keywords)
         if self.config.year_range:
-            current_year = datetime.now().year
             year_constraint = f"year:[{current_year-self.config.year_range} TO {current_year}]"
-            query = f"({keyword}) AND {year_constraint}"
+            query = f"({query}) AND {year_constraint}"
+        max_results = min(self.config.papers_per_keyword * len(keywords), MAX_RESULTS_LIMIT)
             
-        search_args = {
-            "query": query,
-            "max_results": self.config.papers_per_keyword,
-            "batch_size": self.config.papers_per_keyword  # Set batch_size equal to max_results to get all papers in one call
-        }
+        # Execute single search, in as few batches as the batch size limit allows
+        batches = await execute_search(
+            query,
+            max_results=max_results,
+            batch_size=min(max_results, BATCH_SIZE_LIMIT)
+        )
+        papers = []
+        for batch in batches:
+            papers.extend(self._pool_paper(paper) for paper in batch['papers'])
+        abstracts = [self._lowercase_abstract(paper) for paper in papers]
         
-        try:
-            # Execute single search
-            search_results = await search_execution_tool.on_invoke_tool(None, json.dumps(search_args))
-            papers = []
-            if search_results:
-                batches = json.loads(search_results)
-                for batch in batches:
-                    if isinstance(batch, dict) and 'papers' in batch:
-                        papers.extend(batch['papers'])
-                        
-            # Calculate hits in abstracts
-            keyword_words = keyword.lower().split()
-            word_count = len(keyword_words)
-            total_hits = 0
-            papers_with_hits = 0
-            
-            for paper in papers:
-                abstract = paper.get("abstract", "").lower()
-                paper_hits = sum(abstract.count(word) for word in keyword_words)
-                if paper_hits > 0:
-                    papers_with_hits += 1
-                total_hits += paper_hits
-                
-            # Calculate score
-            score = self._calculate_score(total_hits, papers_with_hits, word_count, len(papers))
+        results = []
+        for keyword, key in zip(keywords, keys):
+            result = self._score_keyword(keyword, papers, abstracts)
+            if self._cache:
+                self._store_cached(key, result)
+            results.append(result)
+        return results
             
-            logger.info(f"Analyzed keyword '{keyword}': found {len(papers)} papers with {total_hits} total hits")
+    def _score_keyword(self, keyword: str, papers: List[Dict[str, Any]], abstracts: List[str]) -> KeywordScore:
+        """Count keyword word hits in the lowercased abstracts and score the keyword."""
+        keyword_words = keyword.lower().split()
+        word_count = len(keyword_words)
+        # Each distinct word is counted once per abstract; repeated words weigh in once per occurrence
+        word_counts = Counter(keyword_words)
+        
+        per_paper_hits = [
+            sum(count * abstract.count(word) for word, count in word_counts.items())
+            for abstract in abstracts
+        ]
+        total_hits = sum(per_paper_hits)
+        papers_with_hits = len(per_paper_hits) - per_paper_hits.count(0)
             
-            return KeywordScore(
-                keyword=keyword,
-                papers=papers,
-                word_count=word_count,
-                total_hits=total_hits,
-                papers_with_hits=papers_with_hits,
-                score=score
-            )
+        # Calculate score
+        score = self._calculate_score(total_hits, papers_with_hits, word_count, len(papers))
+        
+        logger.info(f"Analyzed keyword '{keyword}': found {len(papers)} papers with {total_hits} total hits")
+        
+        # Fields are computed here, so skip re-validating (and copying) every paper dict
+        return KeywordScore.model_construct(
+            keyword=keyword,
+            papers=papers,
+            word_count=word_count,
+            total_hits=total_hits,
+            papers_with_hits=papers_with_hits,
+            score=score
+        )
+        
+    def _load_cached(self, key: str) -> Optional[KeywordScore]:
+        """Rebuild a cached KeywordScore from its ID list and the shared paper table."""
+        cached = self._cache.get(key)
+        if cached is None:
+            return None
+        entry = orjson.loads(cached)
+        paper_ids = entry.pop("paper_ids")
+        stored = self._paper_cache.get_many(paper_ids)
+        if len(stored) < len(set(paper_ids)):
+            # Some papers expired or were never written; treat as a miss
+            return None
+        # Validate the scalar fields, then attach the pooled papers without copying them
+        result = KeywordScore.model_validate(entry)
+        papers = [self._pool_paper(orjson.loads(stored[arxiv_id])) for arxiv_id in paper_ids]
+        return result.model_copy(update={"papers": papers})
+        
+    def _store_cached(self, key: str, result: KeywordScore) -> None:
+        """Cache a KeywordScore as paper IDs, writing each paper under its arXiv ID."""
+        self._paper_cache.set_many((paper["arxiv_id"], orjson.dumps(paper)) for paper in result.papers)
+        entry = result.model_dump(exclude={"papers"})
+        entry["paper_ids"] = [paper["arxiv_id"] for paper in result.papers]
+        self._cache.set(key, orjson.dumps(entry))
+        
+    def _pool_paper(self, paper: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the pooled instance of a paper, adding it on first sight."""
+        return self._paper_pool.setdefault(paper["arxiv_id"], paper)
+        
+    def _lowercase_abstract(self, paper: Dict[str, Any]) -> str:
+        """Return the lowercased abstract of a pooled paper, computed once per refinement."""
+        arxiv_id = paper["arxiv_id"]
+        abstract = self._abstracts_lc.get(arxiv_id)
+        if abstract is None:
+            abstract = self._abstracts_lc[arxiv_id] = paper.get("abstract", "").lower()
+        return abstract
+        
+    def _empty_score(self, keyword: str) -> KeywordScore:
+        """Zero score used when the analysis of a keyword fails."""
+        return KeywordScore.model_construct(
+            keyword=keyword,
+            papers=[],
+            word_count=len(keyword.split()),
+            total_hits=0,
+            papers_with_hits=0,
+            score=0.0
+        )
             
-        except Exception as e:
-            logger.error(f"Analysis failed for keyword: {keyword}. Error: {str(e)}")
-            return KeywordScore(
-                keyword=keyword,
-                papers=[],
-                word_count=len(keyword.split()),
-                total_hits=0,
-                papers_with_hits=0,
-                score=0.0
-            )
+    def close(self) -> None:
+        """Close the on-disk caches opened for this refinement."""
+        for cache in (self._cache, self._paper_cache):
+            if cache:
+                cache.close()
             
     #@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     async def refine(self) -> RefinementResult:
@@ -137,29 +271,59 @@ class KeywordRefinement:
         Returns:
             RefinementResult containing scored keywords and metadata
         """
-        print("Refining keywords...")
-        start_time = datetime.now()
-        self.results.metadata["start_time"] = start_time.isoformat()
+        # Wall clock only for the recorded timestamps; the duration uses the monotonic clock
+        self.results.metadata["start_time"] = datetime.now().isoformat()
+        start_mono = time.monotonic()
         
         logger.info(f"Starting keyword refinement for {len(self.config.keywords)} keywords")
         
-        # Analyze each keyword
+        # Search each distinct keyword once; duplicates reuse its score
+        representatives, index_map = _dedupe_keywords(self.config.keywords)
+        if len(representatives) < len(self.config.keywords):
+            logger.info(f"Searching {len(representatives)} distinct keywords out of {len(self.config.keywords)}")
+        
+        # Optionally merge several keywords into one OR query per arXiv call
+        size = self.config.keywords_per_query
+        groups = [representatives[i:i + size] for i in range(0, len(representatives), size)]
+        
+        # Keyword groups run as concurrent tasks so cache hits and scoring overlap the searches;
+        # the arXiv requests themselves are serialized by the search module's rate limiter
+        semaphore = asyncio.Semaphore(self.config.max_concurrent_searches)
+        
+        async def analyze_bounded(group: List[str]) -> List[KeywordScore]:
+            async with semaphore:
+                logger.info(f"Processing keywords: {', '.join(group)}")
+                return await self._analyze_keyword_group(group)
+                
+        results = await asyncio.gather(
+            *(analyze_bounded(group) for group in groups),
+            return_exceptions=True
+        )
+        
+        representative_scores = []
+        for group, result in zip(groups, results):
+            if isinstance(result, Exception):
+                logger.error(f"Analysis failed for keywords: {', '.join(group)}. Error: {str(result)}")
+                result = [self._empty_score(keyword) for keyword in group]
+            representative_scores.extend(result)
+            
         scored_keywords = []
-        for keyword in self.config.keywords:
-            logger.info(f"Processing keyword: {keyword}")
-            result = await self._analyze_keyword(keyword)
+        for keyword, index in zip(self.config.keywords, index_map):
+            result = representative_scores[index]
+            if result.keyword != keyword:
+                result = result.model_copy(update={"keyword": keyword})
             scored_keywords.append(result)
             
         # Sort by score
-        scored_keywords.sort(key=lambda x: x.score, reverse=True)
+        scored_keywords.sort(key=attrgetter("score"), reverse=True)
         self.results.scored_keywords = scored_keywords
         
         # Finalize results
-        end_time = datetime.now()
         self.results.metadata.update({
-            "end_time": end_time.isoformat(),
-            "duration_seconds": (end_time - start_time).total_seconds(),
+            "end_time": datetime.now().isoformat(),
+            "duration_seconds": time.monotonic() - start_mono,
             "keywords_analyzed": len(scored_keywords),
+            "keywords_searched": len(representatives),
             "successful_keywords": len([k for k in scored_keywords if k.score > 0])
         })
         
@@ -187,7 +351,7 @@ class KeywordRefinement:
         strategy.keywords = [k.keyword for k in results.scored_keywords]
         strategy.metadata.update({
             "refinement_results": results.model_dump(),
-            "refinement_timestamp": datetime.now().isoformat()
+            "refinement_timestamp": results.metadata["end_time"]
         })
         
         return strategy 
\ No newline at end of file
@@ -1,12 +1,11 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import asyncio
 import json
-from openai import OpenAI
-from pydantic import BaseModel, Field
-from dotenv import load_dotenv
-
-load_dotenv()
+from openai import AsyncOpenAI
+from pydantic import BaseModel, Field, ValidationError
 
+from .cache import SQLiteCache, cache_key, normalize_text
+from .client import create_chat_completion, create_async_client
 from .types import (
     FormulateQuestionInput,
     FormulateQuestionOutput,
@@ -14,6 +13,43 @@ from .types import (
     ResearchQuestion
 )
 
+# Static prompt text; formulate_question only fills in the template fields
+SYSTEM_MESSAGE = """You are an expert at formulating research questions following the FINER criteria:
+    - Feasible: Can be answered with available resources and methods
+    - Interesting: Addresses a gap or need in the field
+    - Novel: Adds new information to existing knowledge
+    - Ethical: Considers ethical implications
+    - Relevant: Has practical or theoretical significance
+    
+    Your task is to help formulate clear, focused research questions that meet these criteria.
+    For each question, you should:
+    1. Analyze the research area and constraints
+    2. Formulate a main research question
+    3. Generate relevant sub-questions
+    4. Define the scope
+    5. Validate against FINER criteria
+    
+    You must output your response in the following JSON format:
+    {
+        "question": {
+            "question": "The main research question",
+            "sub_questions": ["Sub-question 1", "Sub-question 2"]
+        },
+        "validation": {
+            "feasible": true,
+            "interesting": true,
+            "novel": true,
+            "ethical": true,
+            "relevant": true
+        }
+    }"""
+
+USER_MESSAGE_TEMPLATE = """Please help me formulate a research question for the following area.
+    Please ensure the question meets the FINER criteria and provide a detailed analysis.
+    
+    Constraints: {constraints}
+    Research Area: {research_area}"""
+
 class QuestionResponse(BaseModel):
     """Response format for research question formulation."""
     question: str = Field(description="The main research question")
@@ -35,60 +71,36 @@ class AgentResponse(BaseModel):
 class ResearchQuestionAgent:
     """Agent for formulating and validating research questions."""
     
-    def __init__(self, client: OpenAI = None, timeout: int = 120):
-        self.client = client or OpenAI()
+    def __init__(self, client: AsyncOpenAI = None, timeout: int = 120, cache_path: Optional[str] = None):
+        self.client = client or create_async_client()
         self.timeout = timeout
+        # Optional on-disk cache so repeated runs skip the API call
+        self._cache = SQLiteCache(cache_path, table="research_questions") if cache_path else None
         
     async def formulate_question(self, input_data: FormulateQuestionInput) -> FormulateQuestionOutput:
         """Formulate a research question based on input parameters."""
-        try:
-            # Create the system message with instructions
-            system_message = """You are an expert at formulating research questions following the FINER criteria:
-            - Feasible: Can be answered with available resources and methods
-            - Interesting: Addresses a gap or need in the field
-            - Novel: Adds new information to existing knowledge
-            - Ethical: Considers ethical implications
-            - Relevant: Has practical or theoretical significance
-            
-            Your task is to help formulate clear, focused research questions that meet these criteria.
-            For each question, you should:
-            1. Analyze the research area and constraints
-            2. Formulate a main research question
-            3. Generate relevant sub-questions
-            4. Define the scope
-            5. Validate against FINER criteria
-            
-            You must output your response in the following JSON format:
-            {
-                "question": {
-                    "question": "The main research question",
-                    "sub_questions": ["Sub-question 1", "Sub-question 2"]
-                },
-                "validation": {
-                    "feasible": true,
-                    "interesting": true,
-                    "novel": true,
-                    "ethical": true,
-                    "relevant": true
-                }
-            }"""
+        key = cache_key(normalize_text(input_data.research_area), input_data.constraints)
+        if self._cache is not None:
+            stored = self._cache.get(key)
+            if stored is not None:
+                return FormulateQuestionOutput.model_validate_json(stored)
             
+        try:
             # Create the user message with the research area and constraints
-            user_message = f"""Please help me formulate a research question for the following area:
-            Research Area: {input_data.research_area}
-            Constraints: {input_data.constraints}
-            
-            Please ensure the question meets the FINER criteria and provide a detailed analysis."""
+            user_message = USER_MESSAGE_TEMPLATE.format(
+                constraints=json.dumps(input_data.constraints, sort_keys=True, default=str),
+                research_area=input_data.research_area
+            )
             
             # Call the OpenAI API with a timeout
             try:
                 response = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        self.client.chat.completions.create,
+                    create_chat_completion(
+                        self.client,
                         model="gpt-4-turbo-preview",
                         response_format={"type": "json_object"},
                         messages=[
-                            {"role": "system", "content": system_message},
+                            {"role": "system", "content": SYSTEM_MESSAGE},
                             {"role": "user", "content": user_message}
                         ]
                     ),
@@ -99,21 +111,29 @@ class ResearchQuestionAgent:
             
             # Parse the response
             try:
-                response_data = json.loads(response.choices[0].message.content)
-                agent_response = AgentResponse(**response_data)
+                # Parse and validate in one pass with pydantic's JSON parser
+                agent_response = AgentResponse.model_validate_json(response.choices[0].message.content)
                 
                 # Convert to FormulateQuestionOutput format
-                return FormulateQuestionOutput(
+                output = FormulateQuestionOutput(
                     question=Question(
                         question=agent_response.question.question,
                         sub_questions=agent_response.question.sub_questions
                     ),
                     validation=agent_response.validation.model_dump()
                 )
-            except (json.JSONDecodeError, KeyError) as e:
+                if self._cache is not None:
+                    self._cache.set(key, output.model_dump_json())
+                return output
+            except (ValidationError, KeyError) as e:
                 raise ValueError(f"Invalid response format: {str(e)}")
             
         except TimeoutError:
             raise  # Re-raise TimeoutError without wrapping
         except Exception as e:
             raise RuntimeError(f"Failed to formulate question: {str(e)}") from e
+            
+    def close(self) -> None:
+        """Close the on-disk cache, if one was opened."""
+        if self._cache is not None:
+            self._cache.close()
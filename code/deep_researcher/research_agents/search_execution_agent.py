@@ -1,20 +1,20 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, AsyncIterator
+from functools import lru_cache
+from itertools import islice
 from pydantic import BaseModel, Field, field_validator
 from agents import FunctionTool, Agent
 import arxiv
-import json
+import asyncio
+import orjson
 import logging
+import threading
+import time
 from datetime import datetime
 from tenacity import retry, stop_after_attempt, wait_exponential
-from dotenv import load_dotenv
 
 from agents import Agent, FunctionTool
 from agents.model_settings import ModelSettings
 
-load_dotenv()
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 INSTRUCTIONS = """
@@ -29,6 +29,15 @@ Ensure all searches are properly logged and documented. Handle rate limits and e
 Focus on completeness and reliability of the search results.
 """
 
+VALID_CATEGORIES = frozenset({
+    'cs.AI', 'quant-ph', 'cs.LG', 'cs.CL', 'cs.NE',
+    'stat.ML', 'cs.CV', 'cs.RO', 'cs.HC'
+})
+
+# Bounds enforced on tool arguments; internal callers of execute_search clamp to them too
+MAX_RESULTS_LIMIT = 1000
+BATCH_SIZE_LIMIT = 100
+
 class PaperMetadata(BaseModel):
     """Structured paper metadata for consistent processing"""
     arxiv_id: str
@@ -47,29 +56,26 @@ class PaperMetadata(BaseModel):
 
 class SearchExecutionArgs(BaseModel):
     query: str = Field(description="The optimized search query")
-    max_results: int = Field(default=100, description="Maximum number of results to process", gt=0, le=1000)
+    max_results: int = Field(default=100, description="Maximum number of results to process", gt=0, le=MAX_RESULTS_LIMIT)
     categories: Optional[List[str]] = Field(default=None, description="ArXiv categories to filter by")
-    batch_size: int = Field(default=50, description="Number of papers to process in each batch", gt=0, le=100)
+    batch_size: int = Field(default=50, description="Number of papers to process in each batch", gt=0, le=BATCH_SIZE_LIMIT)
     min_date: Optional[str] = Field(default=None, description="Minimum publication date (YYYY-MM-DD)")
     max_date: Optional[str] = Field(default=None, description="Maximum publication date (YYYY-MM-DD)")
 
     @field_validator('query')
     def query_not_empty(cls, v):
-        if not v.strip():
+        v = v.strip()
+        if not v:
             raise ValueError('Query cannot be empty')
-        return v.strip()
+        return v
 
     @field_validator('categories')
     def validate_categories(cls, v):
         if v is None:
             return v
-        valid_categories = {
-            'cs.AI', 'quant-ph', 'cs.LG', 'cs.CL', 'cs.NE',
-            'stat.ML', 'cs.CV', 'cs.RO', 'cs.HC'
-        }
-        for category in v:
-            if category not in valid_categories:
-                raise ValueError(f'Invalid category: {category}. Valid categories are: {valid_categories}')
+        invalid = set(v) - VALID_CATEGORIES
+        if invalid:
+            raise ValueError(f'Invalid categories: {sorted(invalid)}. Valid categories are: {sorted(VALID_CATEGORIES)}')
         return v
 
 class BatchResult(BaseModel):
@@ -80,81 +86,117 @@ class BatchResult(BaseModel):
     has_more: bool
     search_metadata: Dict[str, Any]
 
+# Largest page the arXiv API will return in one request
+ARXIV_MAX_PAGE_SIZE = 2000
+
+# arXiv's API terms allow one request every three seconds on a single connection
+ARXIV_REQUEST_DELAY = 3.0
+
+# Process-wide limiter shared by every arxiv client; reentrant because the client retries recursively
+_ARXIV_REQUEST_LOCK = threading.RLock()
+_arxiv_last_request = 0.0
+
+class _RateLimitedClient(arxiv.Client):
+    """arxiv client whose page requests all go through the process-wide rate limiter.
+    
+    arxiv.Client only spaces the requests of one instance, and tracks them without
+    locking, so clients used from several worker threads could exceed the limit.
+    """
+    
+    def _parse_feed(self, url: str, first_page: bool = True, _try_index: int = 0):
+        global _arxiv_last_request
+        with _ARXIV_REQUEST_LOCK:
+            wait = _arxiv_last_request + ARXIV_REQUEST_DELAY - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            # Stamped before the request too, so a retry from inside the call is spaced as well
+            _arxiv_last_request = time.monotonic()
+            try:
+                return super()._parse_feed(url, first_page=first_page, _try_index=_try_index)
+            finally:
+                _arxiv_last_request = time.monotonic()
+
+@lru_cache(maxsize=None)
+def _get_arxiv_client(page_size: int) -> arxiv.Client:
+    """Return a shared arxiv client per page size.
+    
+    Reusing the client keeps its HTTP session (and kept-alive connections)
+    across searches. Request spacing is left to the shared rate limiter.
+    """
+    return _RateLimitedClient(page_size=page_size, delay_seconds=0)
+
 # @retry(
 #     stop=stop_after_attempt(3),
 #     wait=wait_exponential(multiplier=1, min=4, max=10),
 #     reraise=True
 # )
-async def execute_search_batch(client: arxiv.Client, search: arxiv.Search, start: int, batch_size: int) -> List[PaperMetadata]:
+async def execute_search_batch(results_iter: Iterator[arxiv.Result], batch_size: int) -> List[PaperMetadata]:
     """Execute a single batch of the search with retry logic"""
-    logger.info(f"Processing batch starting at {start} with size {batch_size}")
+    logger.info(f"Processing batch of up to {batch_size} papers")
     
+    # The arxiv client is synchronous; run it in a worker thread so waiting on arXiv doesn't block the event loop
+    return await asyncio.to_thread(_fetch_batch, results_iter, batch_size)
+
+def _fetch_batch(results_iter: Iterator[arxiv.Result], batch_size: int) -> List[PaperMetadata]:
+    """Blocking fetch of the next batch_size results from a shared result iterator"""
     results = []
-    search_iter = client.results(search)
-    
-    # Skip to the start position
-    for _ in range(start):
-        try:
-            next(search_iter)
-        except StopIteration:
-            return results
-    
-    # Get the batch_size number of results
-    for _ in range(batch_size):
-        try:
-            result = next(search_iter)
-            paper = PaperMetadata(
-                arxiv_id=result.entry_id.split('/')[-1],
-                title=result.title,
-                authors=[author.name for author in result.authors],
-                abstract=result.summary,
-                categories=result.categories,
-                primary_category=result.primary_category,
-                published_date=result.published,
-                updated_date=result.updated,
-                pdf_url=result.pdf_url,
-                abstract_url=result.entry_id,
-                journal_ref=result.journal_ref,
-                doi=result.doi,
-                comment=result.comment
-            )
-            results.append(paper)
-        except StopIteration:
-            break
+    for result in islice(results_iter, batch_size):
+        paper = PaperMetadata(
+            arxiv_id=result.entry_id.rsplit('/', 1)[-1],
+            title=result.title,
+            authors=[author.name for author in result.authors],
+            abstract=result.summary,
+            categories=result.categories,
+            primary_category=result.primary_category,
+            published_date=result.published,
+            updated_date=result.updated,
+            pdf_url=result.pdf_url,
+            abstract_url=result.entry_id,
+            journal_ref=result.journal_ref,
+            doi=result.doi,
+            comment=result.comment
+        )
+        results.append(paper)
     
     return results
 
-async def search_execution(_, args_json: str) -> str:
-    """Execute a complete search operation with batching and full metadata retrieval"""
-    args = SearchExecutionArgs.model_validate_json(args_json)
+async def stream_search(
+    query: str,
+    max_results: int = 100,
+    categories: Optional[List[str]] = None,
+    batch_size: int = 50
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield each batch as a JSON-compatible dict as soon as it is fetched.
     
+    Entry point for trusted internal callers; arguments are not re-validated.
+    """
     # Build the search query
-    search_query = args.query
-    # if args.categories:
-    #     category_query = ' OR '.join(f'cat:{cat}' for cat in args.categories)
+    search_query = query
+    # if categories:
+    #     category_query = ' OR '.join(f'cat:{cat}' for cat in categories)
     #     search_query = f'({search_query}) AND ({category_query})'
     
-    # Create arxiv client
-    client = arxiv.Client()
+    # Shared arxiv client; one page covers the whole result set up to the arXiv API maximum of 2000
+    client = _get_arxiv_client(min(max_results, ARXIV_MAX_PAGE_SIZE))
     
     # Initialize search
     search = arxiv.Search(
         query=search_query,
-        max_results=args.max_results,
+        max_results=max_results,
         sort_by=arxiv.SortCriterion.SubmittedDate
     )
     
-    all_batches = []
+    # One iterator for all batches, so pages are fetched once instead of re-skipped per batch
+    results_iter = client.results(search)
+    
     total_processed = 0
     batch_number = 1
     
-    while total_processed < args.max_results:
+    while total_processed < max_results:
         try:
             batch_results = await execute_search_batch(
-                client,
-                search,
-                total_processed,
-                min(args.batch_size, args.max_results - total_processed)
+                results_iter,
+                min(batch_size, max_results - total_processed)
             )
             
             if not batch_results:
@@ -164,16 +206,15 @@ async def search_execution(_, args_json: str) -> str:
                 batch_number=batch_number,
                 papers=batch_results,
                 total_processed=total_processed + len(batch_results),
-                has_more=total_processed + len(batch_results) < args.max_results,
+                has_more=total_processed + len(batch_results) < max_results,
                 search_metadata={
-                    "query": args.query,
-                    "categories": args.categories,
-                    "batch_size": args.batch_size,
+                    "query": query,
+                    "categories": categories,
+                    "batch_size": batch_size,
                     "timestamp": datetime.now().isoformat()
                 }
             )
             
-            all_batches.append(batch.model_dump())
             total_processed += len(batch_results)
             batch_number += 1
             
@@ -182,8 +223,31 @@ async def search_execution(_, args_json: str) -> str:
         except Exception as e:
             logger.error(f"Error processing batch {batch_number}: {str(e)}")
             raise
+            
+        yield batch.model_dump(mode="json")
+
+async def execute_search(
+    query: str,
+    max_results: int = 100,
+    categories: Optional[List[str]] = None,
+    batch_size: int = 50
+) -> List[Dict[str, Any]]:
+    """Execute a search and return all batches as JSON-compatible dicts.
     
-    return json.dumps(all_batches, default=str)
+    Entry point for trusted internal callers; arguments are not re-validated.
+    """
+    return [batch async for batch in stream_search(query, max_results, categories, batch_size)]
+
+async def search_execution(_, args_json: str) -> str:
+    """Execute a complete search operation with batching and full metadata retrieval"""
+    args = SearchExecutionArgs.model_validate_json(args_json)
+    all_batches = await execute_search(
+        args.query,
+        max_results=args.max_results,
+        categories=args.categories,
+        batch_size=args.batch_size
+    )
+    return orjson.dumps(all_batches).decode()
 
 # Create the function tool
 search_execution_tool = FunctionTool(
@@ -1,7 +1,22 @@
-from dataclasses import dataclass
 from enum import Enum, auto
 from typing import Dict, List, Any, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+__all__ = [
+    "WorkflowState",
+    "SearchStrategy",
+    "Question",
+    "ResearchQuestion",
+    "KeywordSet",
+    "PaperResult",
+    "ScreenedPaper",
+    "FormulateQuestionInput",
+    "FormulateQuestionOutput",
+    "KeywordAnalysisInput",
+    "KeywordAnalysisOutput",
+    "AbstractScreeningInput",
+    "AbstractScreeningOutput",
+]
 
 class WorkflowState(Enum):
     """States of the systematic review workflow."""
@@ -42,6 +57,8 @@ class KeywordSet(BaseModel):
 
 class PaperResult(BaseModel):
     """Structure for paper search results."""
+    model_config = ConfigDict(frozen=True)
+    
     paper_id: str
     title: str
     abstract: str
@@ -49,6 +66,8 @@ class PaperResult(BaseModel):
 
 class ScreenedPaper(BaseModel):
     """Structure for screened paper results."""
+    model_config = ConfigDict(frozen=True)
+    
     paper_id: str
     title: str
     abstract: str
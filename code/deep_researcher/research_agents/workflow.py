@@ -1,8 +1,13 @@
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+import asyncio
+from typing import Dict, Any, Optional, List, Tuple
 import logging
-import json
-from openai import OpenAI
+import re
+from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
+import orjson
+from openai import AsyncOpenAI
 from pydantic import BaseModel, Field
 from tabulate import tabulate
 
@@ -17,9 +22,85 @@ from research_agents.types import (
 )
 from research_agents.research_question_agent import ResearchQuestionAgent
 from research_agents.keyword_analysis_agent import KeywordAnalysisAgent
-from research_agents.search_execution_agent import search_execution_tool
+from research_agents.search_execution_agent import BATCH_SIZE_LIMIT, MAX_RESULTS_LIMIT, execute_search
 from research_agents.abstract_screening_agent import AbstractScreeningAgent, RelevanceScore
 from research_agents.keyword_refinement import KeywordRefinement, RefinementConfig
+from research_agents.cache import SQLiteCache, cache_key, normalize_query, normalize_text
+from research_agents.client import create_async_client
+
+# Default lifetime of cached arXiv searches; new papers are submitted daily
+SEARCH_CACHE_TTL = 24 * 60 * 60
+
+def _keyword_matcher(keywords: List[str]) -> Tuple[Optional[re.Pattern], Dict[str, List[str]]]:
+    """Build a single pattern that finds every lowercased keyword occurrence.
+    
+    The lookahead keeps matches zero-width, so every position is tried and
+    overlapping keywords are all found. Where several keywords start at the
+    same position the longest one matches, and the returned prefix map lists
+    the shorter keywords it contains at that position.
+    """
+    # Canonical order (longest first, then alphabetical) so equal keyword sets share a compiled matcher
+    lowered = tuple(sorted({keyword.lower() for keyword in keywords if keyword}, key=lambda k: (-len(k), k)))
+    return _compile_keyword_matcher(lowered)
+
+@lru_cache(maxsize=64)
+def _compile_keyword_matcher(lowered: Tuple[str, ...]) -> Tuple[Optional[re.Pattern], Dict[str, List[str]]]:
+    """Compile the matcher for a canonical keyword tuple; cached across workflows."""
+    if not lowered:
+        return None, {}
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, lowered)) + "))")
+    prefixes = {keyword: [other for other in lowered if keyword.startswith(other)] for keyword in lowered}
+    return pattern, prefixes
+
+class _SearchStats:
+    """Deduplicates papers and tallies search statistics as papers arrive.
+    
+    Each unique paper is scanned once for keyword hits, year and categories
+    when it is added, so raw search batches can be dropped as soon as they
+    have been consumed.
+    """
+    
+    def __init__(self, keywords: List[str]):
+        self.keywords = keywords
+        self._pattern, self._prefixes = _keyword_matcher(keywords)
+        self._papers: Dict[str, Dict[str, Any]] = {}
+        self._keyword_counter = Counter()
+        self._year_counter = Counter()
+        self._category_counter = Counter()
+        
+    def add(self, paper: Dict[str, Any]) -> bool:
+        """Add a paper unless its arxiv_id was already seen; returns whether it was new."""
+        if paper["arxiv_id"] in self._papers:
+            return False
+        self._papers[paper["arxiv_id"]] = paper
+        
+        if self._pattern:
+            # One scan of title and abstract finds every keyword the paper contains
+            text = f"{paper['title']}\n{paper['abstract']}".lower()
+            found = set()
+            for match in self._pattern.finditer(text):
+                found.update(self._prefixes[match.group(1)])
+            self._keyword_counter.update(found)
+            
+        published_date = paper.get("published_date")
+        if published_date and len(published_date) >= 4:
+            self._year_counter[published_date[:4]] += 1  # Get year from published_date
+        self._category_counter.update(paper.get("categories", []))
+        return True
+        
+    @property
+    def papers(self) -> List[Dict[str, Any]]:
+        """Unique papers in order of first occurrence."""
+        return list(self._papers.values())
+        
+    def to_dict(self) -> Dict[str, Any]:
+        """Statistics in the shape stored on WorkflowResult.search_stats."""
+        return {
+            "total_papers": len(self._papers),
+            "keyword_hits": {keyword: self._keyword_counter[keyword.lower()] for keyword in self.keywords},
+            "year_distribution": dict(self._year_counter),
+            "categories": dict(self._category_counter)
+        }
 
 class WorkflowResult(BaseModel):
     """Complete results from the systematic review workflow."""
@@ -41,15 +122,30 @@ class SystematicReviewWorkflow:
     5. Abstract Screening: Evaluates papers against inclusion criteria
     """
     
-    def __init__(self, openai_client: OpenAI):
-        """Initialize the workflow with OpenAI client and agents."""
+    def __init__(
+        self,
+        openai_client: Optional[AsyncOpenAI] = None,
+        verbose_stats: bool = True,
+        cache_path: Optional[str] = None
+    ):
+        """Initialize the workflow with OpenAI client and agents.
+        
+        Agents are created for each review. When no client is given, each review creates
+        its own pooled client and closes it when the review ends, so reviews can run on
+        separate event loops.
+        Set verbose_stats=False for headless runs to skip formatting the search statistics tables.
+        cache_path enables the on-disk caches; a "cache_path" constraint overrides it per review.
+        """
         self.logger = logging.getLogger("systematic_review")
+        self.openai_client = openai_client
+        self.verbose_stats = verbose_stats
+        self.cache_path = cache_path
         self.state = WorkflowState.INITIALIZING
         
-        # Initialize agents
-        self.research_question_agent = ResearchQuestionAgent(client=openai_client)
-        self.keyword_analysis_agent = KeywordAnalysisAgent(client=openai_client)
-        self.abstract_agent = AbstractScreeningAgent(client=openai_client)
+        # Agents of the current review, created by start_review
+        self.research_question_agent: Optional[ResearchQuestionAgent] = None
+        self.keyword_analysis_agent: Optional[KeywordAnalysisAgent] = None
+        self.abstract_agent: Optional[AbstractScreeningAgent] = None
 
     async def start_review(
         self,
@@ -57,8 +153,20 @@ class SystematicReviewWorkflow:
         constraints: Dict[str, Any]
     ) -> WorkflowResult:
         """Start a new systematic review."""
+        cache_path = constraints.get("cache_path", self.cache_path)
+        
+        # The client and agents are bound to this review's event loop; resources owned here are closed once it finishes
+        client = self.openai_client or create_async_client()
+        self.research_question_agent = ResearchQuestionAgent(client=client, cache_path=cache_path)
+        self.keyword_analysis_agent = KeywordAnalysisAgent(client=client, cache_path=cache_path)
+        self.abstract_agent = AbstractScreeningAgent(client=client)
+        keyword_refinement = None
+        search_cache = screening_cache = None
         try:
             self.logger.info(f"Starting systematic review for: {research_area}")
+            
+            # Settings shared by the refinement and search steps
+            max_results = constraints.get("max_results", 50)
             result = WorkflowResult(
                 research_question=FormulateQuestionOutput(question={"question": "", "sub_questions": []}, validation={}),
                 search_strategy=SearchStrategy(
@@ -69,7 +177,7 @@ class SystematicReviewWorkflow:
             )
             
             # Step 1: Formulate research question
-            print("\n📝 Step 1: Formulating Research Question...")
+            self.logger.info("📝 Step 1: Formulating Research Question...")
             self.state = WorkflowState.QUESTION_FORMULATION
             question_input = FormulateQuestionInput(
                 research_area=research_area,
@@ -79,7 +187,7 @@ class SystematicReviewWorkflow:
             self.logger.info("Research question formulated")
             
             # Step 2: Keyword analysis
-            print("\n🔍 Step 2: Analyzing Keywords...")
+            self.logger.info("🔍 Step 2: Analyzing Keywords...")
             self.state = WorkflowState.KEYWORD_ANALYSIS
             result.search_strategy = await self.keyword_analysis_agent.analyze(
                 result.research_question.question.question,
@@ -92,60 +200,88 @@ class SystematicReviewWorkflow:
             self.logger.info("Keyword analysis completed")
             
             # Step 3: Keyword refinement
-            print("\n🎯 Step 3: Refining Keywords...")
+            self.logger.info("🎯 Step 3: Refining Keywords...")
             self.state = WorkflowState.KEYWORD_REFINEMENT
             refinement_config = RefinementConfig(
                 keywords=result.search_strategy.keywords,
-                papers_per_keyword=constraints.get("max_results", 50),
-                year_range=constraints.get("year_range", 3)
+                papers_per_keyword=max_results,
+                year_range=constraints.get("year_range", 3),
+                keywords_per_query=constraints.get("keywords_per_query", 1),
+                cache_path=cache_path
             )
 
             
             keyword_refinement = KeywordRefinement(refinement_config)
             result.search_strategy = await keyword_refinement.enhance_search_strategy(result.search_strategy)
             result.refinement_results = result.search_strategy.metadata.get("refinement_results")
-            print(f"Refinement results: {result.refinement_results}")
+            self.logger.debug("Refinement results: %s", result.refinement_results)
             self.logger.info(f"Keyword refinement completed with {len(result.search_strategy.keywords)} keywords")
             
             # Step 4: Search for papers using scored keywords
-            print("\n📚 Step 4: Searching ArXiv with Scored Keywords...")
+            self.logger.info("📚 Step 4: Searching ArXiv with Scored Keywords...")
             self.state = WorkflowState.PAPER_SEARCH
-            papers = []
+            search_stats = _SearchStats(result.search_strategy.keywords)
+            semaphore = asyncio.Semaphore(constraints.get("max_concurrent_searches", 8))
             
-            for keyword in result.search_strategy.keywords[:3]:
-                print(f"Searching keyword: {keyword}")
-                search_args = {
-                    "query": keyword,
-                    "max_results": constraints.get("max_results", 50),
-                    "batch_size": constraints.get("batch_size", 50)
-                }
-                
-                try:
-                    # Execute search
-                    search_results = await search_execution_tool.on_invoke_tool(None, json.dumps(search_args))
-                    batches = json.loads(search_results)
+            # Optional persistent caches for search results and screening decisions
+            cache_ttl = constraints.get("cache_ttl")
+            search_ttl = cache_ttl if cache_ttl is not None else SEARCH_CACHE_TTL
+            search_cache = SQLiteCache(cache_path, table="search_results", ttl_seconds=search_ttl) if cache_path else None
+            screening_cache = SQLiteCache(cache_path, table="screening_results", ttl_seconds=cache_ttl) if cache_path else None
+            
+            # Search settings are the same for every keyword
+            batch_size = min(constraints.get("batch_size", 50), BATCH_SIZE_LIMIT)
+            search_max_results = min(max_results, MAX_RESULTS_LIMIT)
+            
+            async def search_keyword(index: int, keyword: str):
+                async with semaphore:
+                    self.logger.debug("Searching keyword: %s", keyword)
+                    # Only whitespace is normalized; arXiv operators (AND/OR/ANDNOT) are case-sensitive
+                    key = cache_key(normalize_query(keyword), search_max_results, batch_size)
+                    try:
+                        cached = search_cache.get(key) if search_cache else None
+                        if cached is not None:
+                            return index, orjson.loads(cached)
+                        # Call the search directly; the JSON tool interface is only needed by agents
+                        batches = await execute_search(keyword, max_results=search_max_results, batch_size=batch_size)
+                        if search_cache:
+                            search_cache.set(key, orjson.dumps(batches))
+                        return index, batches
+                    except Exception as e:
+                        return index, e
+                        
+            # Run the keyword searches as concurrent tasks so cache hits return without waiting on arXiv
+            # (the arXiv requests themselves are rate limited one at a time), and fold each result
+            # into the deduplicated stats as soon as it can be consumed
+            keywords = [keyword for keyword in result.search_strategy.keywords if keyword.strip()][:constraints.get("search_keywords", 3)]
+            pending = {}
+            next_index = 0
+            for future in asyncio.as_completed([search_keyword(i, keyword) for i, keyword in enumerate(keywords)]):
+                index, batches = await future
+                pending[index] = batches
+                # Consume in keyword order so the paper order stays deterministic
+                while next_index in pending:
+                    batches = pending.pop(next_index)
+                    keyword = keywords[next_index]
+                    next_index += 1
+                    if isinstance(batches, Exception):
+                        # Continue with the other keywords if one fails
+                        self.logger.error(f"Search failed for keyword: {keyword}. Error: {str(batches)}")
+                        continue
                     for batch in batches:
-                        papers.extend(batch["papers"])
-                except Exception as e:
-                    self.logger.error(f"Search failed for keyword: {keyword}. Error: {str(e)}")
-                    continue  # Continue with next keyword if one fails
-                    
-            # Deduplicate papers based on arxiv_id
-            seen_papers = set()
-            unique_papers = []
-            for paper in papers:
-                if paper["arxiv_id"] not in seen_papers:
-                    seen_papers.add(paper["arxiv_id"])
-                    unique_papers.append(paper)
-                    
+                        for paper in batch["papers"]:
+                            search_stats.add(paper)
+                            
+            unique_papers = search_stats.papers
             result.papers = unique_papers
-            result.search_stats = self._calculate_search_stats(unique_papers, result.search_strategy)
-            self._print_search_stats(result.search_stats)
+            result.search_stats = search_stats.to_dict()
+            if self.verbose_stats:
+                self._print_search_stats(result.search_stats)
             self.logger.info(f"Found {len(unique_papers)} unique papers")
             
             # Step 5: Screen papers using abstract_screening_tool
             if unique_papers:
-                print("\n🔎 Step 5: Screening Papers...")
+                self.logger.info("🔎 Step 5: Screening Papers...")
                 self.state = WorkflowState.ABSTRACT_SCREENING
                 
                 # Prepare screening criteria
@@ -158,26 +294,105 @@ class SystematicReviewWorkflow:
                     }
                 }
                 
-                # Screen papers using the agent
-                screened_papers = await self.abstract_agent.screen_papers(
-                    papers=unique_papers,
-                    criteria=screening_args["criteria"],
-                    context={"research_question": result.research_question.question.question}
-                )
+                screening_context = {"research_question": result.research_question.question.question}
                 
-                # Format the results
-                screening_results = json.dumps([{
+                # Reuse cached decisions for papers already screened against the same criteria and context.
+                # Keys use the normalized title and abstract rather than arxiv_id, whose version suffix
+                # changes on every revision, so unchanged text is never screened twice.
+                screened_by_id: Dict[str, ScreenedPaper] = {}
+                screening_keys: Dict[str, str] = {}
+                if screening_cache:
+                    screening_keys = {
+                        paper["arxiv_id"]: cache_key(
+                            normalize_text(paper["title"]),
+                            normalize_text(paper["abstract"]),
+                            screening_args["criteria"],
+                            screening_context
+                        )
+                        for paper in unique_papers
+                    }
+                    cached = screening_cache.get_many(list(screening_keys.values()))
+                    for arxiv_id, key in screening_keys.items():
+                        if key in cached:
+                            screened_by_id[arxiv_id] = ScreenedPaper.model_validate_json(cached[key])
+                    self.logger.info(f"Reusing {len(screened_by_id)} cached screening results")
+                to_screen = [paper for paper in unique_papers if paper["arxiv_id"] not in screened_by_id]
+                
+                def remember_screened(papers: List[Dict[str, Any]], screened_chunk: List[ScreenedPaper]):
+                    """Record screened papers, caching them at once so a later failure does not discard them."""
+                    pairs = list(zip(papers, screened_chunk))
+                    for paper, screened in pairs:
+                        screened_by_id[paper["arxiv_id"]] = screened
+                    if screening_cache:
+                        screening_cache.set_many(
+                            (screening_keys[paper["arxiv_id"]], screened.model_dump_json())
+                            for paper, screened in pairs
+                        )
+                        
+                if constraints.get("screening_mode") == "batch":
+                    # Opt-in OpenAI Batch API: half the cost, but results can take hours
+                    remember_screened(to_screen, await self.abstract_agent.screen_papers_batch(
+                        papers=to_screen,
+                        criteria=screening_args["criteria"],
+                        context=screening_context
+                    ))
+                else:
+                    # Screen papers in chunks; the semaphore caps concurrent OpenAI requests
+                    screen_batch = constraints.get("screen_batch", 20)
+                    chunks = [to_screen[i:i + screen_batch] for i in range(0, len(to_screen), screen_batch)]
+                    semaphore = asyncio.Semaphore(constraints.get("max_concurrent_screens", 4))
+                    
+                    async def screen_chunk(index: int, chunk: List[Dict[str, Any]]):
+                        async with semaphore:
+                            try:
+                                return index, await self.abstract_agent.screen_papers(
+                                    papers=chunk,
+                                    criteria=screening_args["criteria"],
+                                    context=screening_context
+                                )
+                            except Exception as e:
+                                return index, e
+                                
+                    failures = []
+                    for done, future in enumerate(asyncio.as_completed(
+                        [screen_chunk(i, chunk) for i, chunk in enumerate(chunks)]
+                    ), start=1):
+                        index, screened_chunk = await future
+                        if isinstance(screened_chunk, Exception):
+                            failures.append(screened_chunk)
+                            continue
+                        remember_screened(chunks[index], screened_chunk)
+                        self.logger.info(f"Screened batch {done}/{len(chunks)}")
+                    if failures:
+                        # Finished chunks are already cached, so a rerun only screens the failed ones
+                        raise failures[0]
+                        
+                screened_papers = [screened_by_id[paper["arxiv_id"]] for paper in unique_papers]
+                
+                # Format the results; dumping hundreds of models is CPU-bound, so keep it off the event loop
+                # (JSON mode keeps the same plain-type output the old dumps/loads round-trip produced)
+                dumped_papers = await asyncio.to_thread(
+                    lambda: [paper.model_dump(mode="json") for paper in screened_papers]
+                )
+                # Relevance tiers in one pass over the scores
+                high_relevance = medium_relevance = low_relevance = 0
+                for paper in screened_papers:
+                    score = paper.relevance_score
+                    high_relevance += score > 0.7
+                    medium_relevance += 0.4 <= score <= 0.7
+                    low_relevance += score < 0.4
+                    
+                result.screened_papers = [{
                     "batch_id": "batch-1",
-                    "papers": [paper.model_dump() for paper in screened_papers],
+                    "papers": dumped_papers,
                     "batch_statistics": {
                         "total_papers": len(screened_papers),
-                        "high_relevance": sum(1 for p in screened_papers if p.relevance_score > 0.7),
-                        "medium_relevance": sum(1 for p in screened_papers if 0.4 <= p.relevance_score <= 0.7),
-                        "low_relevance": sum(1 for p in screened_papers if p.relevance_score < 0.4)
+                        "high_relevance": high_relevance,
+                        "medium_relevance": medium_relevance,
+                        "low_relevance": low_relevance
                     },
                     "timestamp": datetime.now().isoformat()
-                }])
-                result.screened_papers = json.loads(screening_results)
+                }]
             
             self.state = WorkflowState.COMPLETED
             return result
@@ -187,56 +402,32 @@ class SystematicReviewWorkflow:
             self.logger.error(f"Workflow error: {str(e)}")
             raise RuntimeError(f"Workflow failed: {str(e)}") from e
             
-    def _calculate_search_stats(self, papers: List[Dict[str, Any]], strategy: SearchStrategy) -> Dict[str, Any]:
-        """Calculate statistics about the search results."""
-        stats = {
-            "total_papers": len(papers),
-            "keyword_hits": {},
-            "year_distribution": {},
-            "categories": {}
-        }
-        
-        # Count keyword hits
-        print(f"Papers: {papers[0]['abstract']}")
-
-        for keyword in strategy.keywords:
-            print(f"Keyword: {keyword}")
-            hits = sum([1 for paper in papers if 
-                      keyword.lower() in paper["title"].lower() or 
-                      keyword.lower() in paper["abstract"].lower()])
-            stats["keyword_hits"][keyword] = hits
-            
-        # Count years and categories
-        for paper in papers:
-            year = paper.get("published_date", "")[:4]  # Get year from published_date
-            if year:
-                stats["year_distribution"][year] = stats["year_distribution"].get(year, 0) + 1
+        finally:
+            self.research_question_agent.close()
+            self.keyword_analysis_agent.close()
+            if keyword_refinement:
+                keyword_refinement.close()
+            for cache in (search_cache, screening_cache):
+                if cache:
+                    cache.close()
+            if client is not self.openai_client:
+                await client.close()
             
-            categories = paper.get("categories", [])
-            for category in categories:
-                stats["categories"][category] = stats["categories"].get(category, 0) + 1
-                
-        return stats
-        
     def _print_search_stats(self, stats: Dict[str, Any]):
         """Print search statistics in a nice format."""
         print(f"\nFound {stats['total_papers']} papers in total")
         
         # Print keyword hits table
-        keyword_table = [[keyword, hits] for keyword, hits in stats["keyword_hits"].items()]
         print("\nKeyword Hits:")
-        print(tabulate(keyword_table, headers=["Keyword", "Hits"], tablefmt="grid"))
+        print(tabulate(stats["keyword_hits"].items(), headers=["Keyword", "Hits"], tablefmt="grid"))
         
         # Print year distribution
         if stats["year_distribution"]:
-            years = sorted(stats["year_distribution"].keys())
-            year_table = [[year, stats["year_distribution"][year]] for year in years]
             print("\nYear Distribution:")
-            print(tabulate(year_table, headers=["Year", "Papers"], tablefmt="grid"))
+            print(tabulate(sorted(stats["year_distribution"].items()), headers=["Year", "Papers"], tablefmt="grid"))
         
         # Print top categories
         if stats["categories"]:
-            categories = sorted(stats["categories"].items(), key=lambda x: x[1], reverse=True)[:5]
-            category_table = [[cat, count] for cat, count in categories]
+            categories = sorted(stats["categories"].items(), key=itemgetter(1), reverse=True)[:5]
             print("\nTop Categories:")
-            print(tabulate(category_table, headers=["Category", "Papers"], tablefmt="grid"))
\ No newline at end of file
+            print(tabulate(categories, headers=["Category", "Papers"], tablefmt="grid"))
\ No newline at end of file
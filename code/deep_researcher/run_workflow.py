@@ -1,47 +1,55 @@
 import asyncio
-from openai import OpenAI
+import logging
+import os
 from research_agents.workflow import SystematicReviewWorkflow
 
+# RH_DEBUG=1 turns on debug output, including the chatty HTTP client loggers
+DEBUG = os.getenv("RH_DEBUG") == "1"
+logging.basicConfig(level=logging.DEBUG if DEBUG else logging.INFO)
+for noisy in ("httpx", "httpcore", "arxiv"):
+    logging.getLogger(noisy).setLevel(logging.DEBUG if DEBUG else logging.WARNING)
+
+# Research parameters; fixed inputs keep the agent and search cache keys stable between runs
+RESEARCH_AREA = "Line Item Detection in Invoices"
+CONSTRAINTS = {
+    "publication_years": [2020, 2025],
+    "max_results":500,
+    "batch_size": 100,
+    "max_combinations": 4,
+    "max_papers_per_combination": 10,
+    "max_iterations": 5,
+    "year_range": 3,
+    "methodology_focus": ["experimental", "theoretical"]
+}
+
 async def run_workflow():
     """Run the systematic review workflow with default parameters."""
     print("\n🚀 Starting systematic review workflow...")
     
-    # Initialize workflow
-    client = OpenAI()
-    workflow = SystematicReviewWorkflow(client)
-    
-    # Set research parameters
-    research_area = "Line Item Detection in Invoices"
-    constraints = {
-        "publication_years": [2020, 2025],
-        "max_results":500,
-        "batch_size": 100,
-        "max_combinations": 4,
-        "max_papers_per_combination": 10,
-        "max_iterations": 5,
-        "year_range": 3,
-        "methodology_focus": ["experimental", "theoretical"]
-    }
+    # Initialize workflow; it creates and closes its own OpenAI client for each review
+    workflow = SystematicReviewWorkflow()
     
     try:
         # Execute workflow
-        result = await workflow.start_review(research_area, constraints)
+        result = await workflow.start_review(RESEARCH_AREA, CONSTRAINTS)
         
         # Print final results
         print("\n✅ Workflow completed successfully!")
         print(f"\nResearch Question: {result.research_question.question.question}")
         
         if result.research_question.question.sub_questions:
-            print("\nSub-questions:")
-            for i, q in enumerate(result.research_question.question.sub_questions, 1):
-                print(f"{i}. {q}")
+            print("\nSub-questions:\n" + "\n".join(
+                f"{i}. {q}" for i, q in enumerate(result.research_question.question.sub_questions, 1)
+            ))
         
         print(f"\nFound {len(result.papers)} papers in total")
         
         if result.screened_papers:
             total_relevant = sum(
-                len([p for p in batch["papers"] if p["relevance_score"] > 0.5])
+                1
                 for batch in result.screened_papers
+                for p in batch["papers"]
+                if p["relevance_score"] > 0.5
             )
             print(f"After screening: {total_relevant} highly relevant papers")
             
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from research_agents.cache import SQLiteCache, cache_key, normalize_query, normalize_text
+from research_agents.keyword_refinement import _dedupe_keywords
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.delenv("CACHE_BYPASS", raising=False)
+    return str(tmp_path / "cache.db")
+
+def test_cache_hit_and_miss(cache_path):
+    cache = SQLiteCache(cache_path)
+    cache.set("a", "1")
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    cache.close()
+
+def test_cache_persists_across_connections(cache_path):
+    cache = SQLiteCache(cache_path, table="papers")
+    cache.set("a", b"payload")
+    cache.close()
+    
+    reopened = SQLiteCache(cache_path, table="papers")
+    other = SQLiteCache(cache_path, table="other")
+    assert reopened.get("a") == b"payload"
+    # Tables in the same file are independent
+    assert other.get("a") is None
+    reopened.close()
+    other.close()
+
+def test_cache_ttl_expiry(cache_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = SQLiteCache(cache_path, ttl_seconds=60)
+    cache.set("a", "1")
+    cache.set_many([("b", "2")])
+    
+    now[0] += 60
+    assert cache.get("a") == "1"
+    assert cache.get_many(["a", "b"]) == {"a": "1", "b": "2"}
+    
+    now[0] += 1
+    assert cache.get("a") is None
+    assert cache.get_many(["a", "b"]) == {}
+    cache.close()
+
+def test_cache_bypass(cache_path, monkeypatch):
+    seeded = SQLiteCache(cache_path)
+    seeded.set("a", "1")
+    seeded.close()
+    
+    monkeypatch.setenv("CACHE_BYPASS", "1")
+    cache = SQLiteCache(cache_path)
+    assert cache.get("a") is None
+    assert cache.get_many(["a"]) == {}
+    
+    # Entries are still refreshed while bypassing
+    cache.set("a", "2")
+    cache.close()
+    monkeypatch.setenv("CACHE_BYPASS", "0")
+    reopened = SQLiteCache(cache_path)
+    assert reopened.get("a") == "2"
+    reopened.close()
+
+def test_cache_get_many_spans_chunks(cache_path):
+    cache = SQLiteCache(cache_path)
+    cache.set_many((f"k{i}", str(i)) for i in range(1200))
+    
+    found = cache.get_many([f"k{i}" for i in range(1300)])
+    assert len(found) == 1200
+    assert found["k0"] == "0" and found["k1199"] == "1199"
+    assert cache.get_many([]) == {}
+    cache.close()
+
+def test_cache_key_and_normalization():
+    assert cache_key("a", 1) == cache_key("a", 1)
+    assert cache_key("a", 1) != cache_key("a", 2)
+    assert normalize_text("  Deep   Learning ") == "deep learning"
+    assert normalize_query("  a   AND b ") == "a AND b"
+    assert normalize_query("a and b") != normalize_query("a AND b")
+
+def test_dedupe_keywords_collapses_spacing():
+    representatives, index_map = _dedupe_keywords(["graph  networks", "graph networks", "transformers"])
+    assert representatives == ["graph  networks", "transformers"]
+    assert index_map == [0, 0, 1]
+
+def test_dedupe_keywords_keeps_order_and_operator_case():
+    keywords = [
+        "vision ANDNOT transformer",
+        "transformer ANDNOT vision",
+        "a AND b",
+        "a and b",
+    ]
+    representatives, index_map = _dedupe_keywords(keywords)
+    assert representatives == keywords
+    assert index_map == [0, 1, 2, 3]
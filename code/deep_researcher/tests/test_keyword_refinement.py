@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from research_agents.keyword_refinement import KeywordRefinement, RefinementConfig
+
+ABSTRACTS = [
+    "llms act as agents; an llm agent coordinates other agents.",
+    "deep learning with deeper networks for deep reinforcement learning.",
+    "no matching words here.",
+]
+
+def _reference_hits(keyword, abstract):
+    """Hit count of the original implementation: one str.count per keyword word."""
+    return sum(abstract.count(word) for word in keyword.lower().split())
+
+def _papers():
+    return [{"arxiv_id": str(i), "title": f"Paper {i}", "abstract": abstract} for i, abstract in enumerate(ABSTRACTS)]
+
+@pytest.fixture
+def refinement():
+    refinement = KeywordRefinement(RefinementConfig(keywords=[]))
+    yield refinement
+    refinement.close()
+
+@pytest.mark.parametrize("keyword", [
+    "(LLM OR LLMs) AND (agent OR agents)",
+    "LLM OR LLMs AND agent OR agents",
+    "deep deep learning",
+    "deep learning",
+    "agent",
+    "",
+])
+def test_score_keyword_matches_reference_counts(refinement, keyword):
+    papers = _papers()
+    result = refinement._score_keyword(keyword, papers, ABSTRACTS)
+    
+    per_paper = [_reference_hits(keyword, abstract) for abstract in ABSTRACTS]
+    assert result.total_hits == sum(per_paper)
+    assert result.papers_with_hits == sum(1 for hits in per_paper if hits)
+    assert result.word_count == len(keyword.split())
+
+def test_cached_score_round_trip(tmp_path, monkeypatch):
+    monkeypatch.delenv("CACHE_BYPASS", raising=False)
+    config = RefinementConfig(keywords=[], cache_path=str(tmp_path / "cache.db"))
+    writer = KeywordRefinement(config)
+    papers = _papers()
+    result = writer._score_keyword("deep learning", papers, ABSTRACTS)
+    writer._store_cached("key", result)
+    writer.close()
+    
+    reader = KeywordRefinement(config)
+    try:
+        cached = reader._load_cached("key")
+        assert cached == result
+        assert cached.papers == papers
+        assert reader._load_cached("missing") is None
+    finally:
+        reader.close()
+
+def test_analyze_keyword_group_shares_inflight_search(refinement, monkeypatch):
+    calls = []
+    
+    async def search(keywords):
+        calls.append(keywords)
+        await asyncio.sleep(0.01)
+        return [refinement._empty_score(keyword) for keyword in keywords]
+        
+    monkeypatch.setattr(refinement, "_search_keyword_group", search)
+    
+    async def run():
+        return await asyncio.gather(
+            refinement._analyze_keyword_group(["graph networks"]),
+            refinement._analyze_keyword_group(["graph  networks"])
+        )
+        
+    first, second = asyncio.run(run())
+    assert len(calls) == 1
+    assert first[0].keyword == "graph networks"
+    # Each caller gets its own spelling of the keyword back
+    assert second[0].keyword == "graph  networks"
+
+def test_analyze_keyword_group_forgets_failed_search(refinement, monkeypatch):
+    calls = []
+    
+    async def search(keywords):
+        calls.append(keywords)
+        if len(calls) == 1:
+            raise RuntimeError("arXiv unavailable")
+        return [refinement._empty_score(keyword).model_copy(update={"score": 1.0}) for keyword in keywords]
+        
+    monkeypatch.setattr(refinement, "_search_keyword_group", search)
+    
+    failed = asyncio.run(refinement._analyze_keyword_group(["agents"]))
+    assert failed[0].score == 0.0
+    assert not refinement._inflight
+    
+    retried = asyncio.run(refinement._analyze_keyword_group(["agents"]))
+    assert len(calls) == 2
+    assert retried[0].score == 1.0
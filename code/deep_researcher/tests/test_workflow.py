@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from research_agents import workflow
+from research_agents.types import FormulateQuestionOutput, ScreenedPaper, SearchStrategy
+from research_agents.workflow import SystematicReviewWorkflow, _SearchStats, _keyword_matcher
+
+def _paper(arxiv_id, title="", abstract="", published_date="2024-01-01T00:00:00", categories=("cs.AI",)):
+    return {
+        "arxiv_id": arxiv_id,
+        "title": title,
+        "abstract": abstract,
+        "published_date": published_date,
+        "categories": list(categories)
+    }
+
+def test_keyword_matcher_prefix_map():
+    pattern, prefixes = _keyword_matcher(["Deep", "deep learning", "learning", ""])
+    assert prefixes["deep learning"] == ["deep learning", "deep"]
+    assert prefixes["deep"] == ["deep"]
+    # Zero-width matches find overlapping keywords at every position
+    assert [match.group(1) for match in pattern.finditer("deep learning")] == ["deep learning", "learning"]
+    assert _keyword_matcher([]) == (None, {})
+
+def test_search_stats_counts_nested_keywords():
+    keywords = ["deep learning", "Deep", "learning", "reinforcement learning", "transformer"]
+    papers = [
+        _paper("1", "Deep reinforcement learning", "Agents that act."),
+        _paper("2", "A survey", "Deep learning for vision."),
+        _paper("3", "Transformers", "Attention based models."),
+    ]
+    stats = _SearchStats(keywords)
+    for paper in papers:
+        stats.add(paper)
+        
+    # Same as testing each keyword separately against title and abstract
+    expected = {
+        keyword: sum(keyword.lower() in f"{p['title']}\n{p['abstract']}".lower() for p in papers)
+        for keyword in keywords
+    }
+    assert stats.to_dict()["keyword_hits"] == expected
+
+def test_search_stats_dedupes_by_arxiv_id():
+    stats = _SearchStats(["graph"])
+    assert stats.add(_paper("1", "Graph nets", categories=("cs.LG",)))
+    assert not stats.add(_paper("1", "Graph nets, again", categories=("cs.LG",)))
+    assert stats.add(_paper("2", "Other", published_date="2023-05-01T00:00:00"))
+    
+    result = stats.to_dict()
+    assert [paper["arxiv_id"] for paper in stats.papers] == ["1", "2"]
+    assert stats.papers[0]["title"] == "Graph nets"
+    assert result["total_papers"] == 2
+    assert result["keyword_hits"] == {"graph": 1}
+    assert result["year_distribution"] == {"2024": 1, "2023": 1}
+    assert result["categories"] == {"cs.LG": 1, "cs.AI": 1}
+
+class _FakeQuestionAgent:
+    def __init__(self, **kwargs):
+        pass
+        
+    async def formulate_question(self, input_data):
+        return FormulateQuestionOutput(question={"question": "q", "sub_questions": []}, validation={})
+        
+    def close(self):
+        pass
+        
+class _FakeKeywordAgent(_FakeQuestionAgent):
+    async def analyze(self, research_question, context=None):
+        return SearchStrategy(keywords=["slow", "failing", "medium", "fast"], constraints={}, metadata={})
+        
+class _FakeRefinement:
+    def __init__(self, config):
+        pass
+        
+    async def enhance_search_strategy(self, strategy):
+        return strategy
+        
+    def close(self):
+        pass
+        
+class _FakeScreeningAgent:
+    def __init__(self, **kwargs):
+        pass
+        
+    async def screen_papers(self, papers, criteria, context=None):
+        return [
+            ScreenedPaper(
+                paper_id=paper["arxiv_id"],
+                title=paper["title"],
+                abstract=paper["abstract"],
+                metadata={},
+                relevance_score=0.5,
+                inclusion_criteria={},
+                priority_rank=1
+            )
+            for paper in papers
+        ]
+
+@pytest.fixture
+def fake_agents(monkeypatch):
+    monkeypatch.setattr(workflow, "ResearchQuestionAgent", _FakeQuestionAgent)
+    monkeypatch.setattr(workflow, "KeywordAnalysisAgent", _FakeKeywordAgent)
+    monkeypatch.setattr(workflow, "KeywordRefinement", _FakeRefinement)
+    monkeypatch.setattr(workflow, "AbstractScreeningAgent", _FakeScreeningAgent)
+
+def test_search_results_follow_keyword_order(fake_agents, monkeypatch):
+    # Earlier keywords finish last, so as_completed yields them in reverse
+    delays = {"slow": 0.03, "failing": 0.02, "medium": 0.01, "fast": 0.0}
+    results = {
+        "slow": [_paper("s1"), _paper("shared")],
+        "medium": [_paper("m1")],
+        "fast": [_paper("shared"), _paper("f1")],
+    }
+    
+    async def execute_search(keyword, max_results, batch_size):
+        await asyncio.sleep(delays[keyword])
+        if keyword == "failing":
+            raise RuntimeError("arXiv unavailable")
+        return [{"papers": results[keyword]}]
+        
+    monkeypatch.setattr(workflow, "execute_search", execute_search)
+    
+    review = SystematicReviewWorkflow(openai_client=object(), verbose_stats=False)
+    result = asyncio.run(review.start_review("area", {"search_keywords": 4}))
+    
+    assert [paper["arxiv_id"] for paper in result.papers] == ["s1", "shared", "m1", "f1"]
+    assert [paper["paper_id"] for paper in result.screened_papers[0]["papers"]] == ["s1", "shared", "m1", "f1"]